@@ -0,0 +1,341 @@
+"""
+Async HTTP API for the No-Brainer Offer Builder.
+
+Exposes website analysis, AI suggestions and offer scoring for integrations
+(e.g. a CRM) using the same logic as the Streamlit app:
+
+    POST /analyze-website     {"url": "...", "refresh": false}
+    POST /suggest/{type}      {"context": {"industry": "...", ...}, "input": "..."}
+    POST /analyze-offer       {"offer": {"industry": "...", "product": "...", "outcome_description": "...", ...}}
+    POST /score               {"dream_outcome": 8, "likelihood": 7, "speed": 6, "ease": 7,
+                               "total_value": 2000, "offer_price": 499, "risk_reversal": 8}
+    GET  /health
+
+Every endpoint except /health requires the X-API-Token header to match
+OFFER_BUILDER_API_TOKEN. Requests beyond the in-flight limit are rejected with
+429 instead of queueing.
+
+Usage:
+    OFFER_BUILDER_API_TOKEN=<secret> python api-server.py --port 8080 --max-in-flight 500 --timeout 60
+"""
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import math
+import os
+import socket
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+import openai
+from aiohttp import web
+
+from offer_engine import (
+    ANALYSIS_SECTIONS, SCRAPE_HEADERS, SUGGESTION_PROMPT_TYPES, ApiKeyPool, WebsiteAnalysisMemo,
+    achat_completion, calculate_offer_score, extract_website_text, is_successful_analysis, load_api_keys,
+    offer_business, offer_synthesis_input, page_fingerprint, parse_website_analysis,
+    section_analysis_request, suggestion_messages, website_messages
+)
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+TOKEN_HEADER = "X-API-Token"
+MAX_PAGE_BYTES = 2 * 1024 * 1024  # Only the first 8000 characters of text are analyzed
+MAX_REDIRECTS = 5
+
+def load_secrets():
+    """Read the Streamlit secrets file so the API shares the app's key configuration"""
+    if tomllib is None or not os.path.exists(SECRETS_PATH):
+        return {}
+    with open(SECRETS_PATH, "rb") as f:
+        return tomllib.load(f)
+
+class RequestCounters:
+    """Request counts, kept in one mutable object because a started Application must not be changed"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.cancelled = 0
+
+def json_error(status, message, headers=None):
+    return web.json_response({"error": message}, status=status, headers=headers)
+
+async def read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text='{"error": "Request body must be valid JSON"}', content_type="application/json")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text='{"error": "Request body must be a JSON object"}', content_type="application/json")
+    return body
+
+def is_public_address(host):
+    """Whether an IP address is publicly routable (not private, loopback, link-local or reserved)"""
+    address = ipaddress.ip_address(host.split("%", 1)[0])
+    if getattr(address, "ipv4_mapped", None) is not None:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+class NonPublicAddressError(OSError):
+    pass
+
+class PublicResolver(aiohttp.ThreadedResolver):
+    """Resolver for scraping that refuses hosts resolving to non-public addresses"""
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        hosts = await super().resolve(host, port, family)
+        if not all(is_public_address(h["host"]) for h in hosts):
+            raise NonPublicAddressError(f"{host} does not resolve to a public address")
+        return hosts
+
+async def fetch_page(http, url):
+    """Fetch a public web page, following redirects only to public hosts and reading at most MAX_PAGE_BYTES"""
+    for _ in range(MAX_REDIRECTS + 1):
+        host = urlparse(url).hostname or ""
+        try:
+            literal = ipaddress.ip_address(host)
+        except ValueError:
+            literal = None
+        if literal is not None and not is_public_address(host):
+            raise NonPublicAddressError(f"{host} is not a public address")
+
+        async with http.get(url, headers=SCRAPE_HEADERS, allow_redirects=False,
+                            timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status in (301, 302, 303, 307, 308) and "Location" in response.headers:
+                url = urljoin(url, response.headers["Location"])
+                if not url.startswith(('http://', 'https://')):
+                    raise aiohttp.InvalidURL(url)
+                continue
+            response.raise_for_status()
+
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                body += chunk
+                if len(body) >= MAX_PAGE_BYTES:
+                    break
+            return bytes(body[:MAX_PAGE_BYTES]).decode(response.charset or "utf-8", errors="replace")
+
+    raise aiohttp.ClientError(f"More than {MAX_REDIRECTS} redirects")
+
+def read_page_text(html):
+    """Extract the page text and its fingerprint (both CPU-bound)"""
+    website_text = extract_website_text(html)
+    return website_text, page_fingerprint(website_text)
+
+@web.middleware
+async def require_token(request, handler):
+    """Reject requests without the shared API token"""
+    if request.path == "/health":
+        return await handler(request)
+    token = request.headers.get(TOKEN_HEADER, "")
+    if not hmac.compare_digest(token.encode("utf-8"), request.app["api_token"].encode("utf-8")):
+        return json_error(401, f"Missing or invalid {TOKEN_HEADER} header")
+    return await handler(request)
+
+@web.middleware
+async def backpressure(request, handler):
+    """Reject requests beyond the in-flight limit with 429 and bound each request's time"""
+    app = request.app
+    if request.path == "/health":
+        return await handler(request)
+    counters = app["counters"]
+    if counters.in_flight >= app["max_in_flight"]:
+        return json_error(429, "Server is at capacity, retry shortly", headers={"Retry-After": "1"})
+
+    counters.in_flight += 1
+    # Share one connection pool for all upstream OpenAI calls made by this request
+    openai.aiosession.set(app["http"])
+    try:
+        return await asyncio.wait_for(handler(request), app["timeout"])
+    except asyncio.TimeoutError:
+        return json_error(504, "Request timed out")
+    except asyncio.CancelledError:
+        # The client disconnected; the upstream OpenAI call was aborted with the handler
+        counters.cancelled += 1
+        raise
+    finally:
+        counters.in_flight -= 1
+
+async def analyze_website(request):
+    body = await read_json(request)
+    url = str(body.get("url", "")).strip()
+    if not url:
+        return json_error(400, "Missing 'url'")
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+
+    try:
+        html = await fetch_page(request.app["scraper"], url)
+    except NonPublicAddressError as e:
+        return json_error(400, f"Website must be on a public address: {e}")
+    except aiohttp.ClientConnectorError as e:
+        if isinstance(e.os_error, NonPublicAddressError):
+            return json_error(400, f"Website must be on a public address: {e.os_error}")
+        return json_error(502, f"Could not scrape website: {str(e) or type(e).__name__}")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return json_error(502, f"Could not scrape website: {str(e) or type(e).__name__}")
+
+    # HTML parsing and fingerprinting are CPU-bound, keep them off the event loop
+    website_text, fingerprint = await asyncio.get_running_loop().run_in_executor(None, read_page_text, html)
+
+    domain = urlparse(url).netloc
+    memo = request.app["memo"]
+    if not body.get("refresh"):
+        analysis = memo.lookup(domain, fingerprint)
+        if analysis is not None:
+            return web.json_response({"analysis": analysis, "cached": True})
+
+    try:
+        response = await achat_completion(
+            request.app["pool"],
+            website_messages(website_text, domain),
+            max_tokens=1000,
+            temperature=0.5,
+            request_timeout=request.app["upstream_timeout"]
+        )
+    except openai.error.OpenAIError as e:
+        return json_error(502, f"AI analysis error: {str(e)}")
+
+    analysis = parse_website_analysis(response.choices[0].message.content)
+    if is_successful_analysis(analysis):
+        memo.store(domain, fingerprint, analysis)
+    return web.json_response({"analysis": analysis, "cached": False})
+
+async def suggest(request):
+    prompt_type = request.match_info["prompt_type"]
+    if prompt_type not in SUGGESTION_PROMPT_TYPES:
+        return json_error(404, f"Unknown prompt type '{prompt_type}', expected one of: {', '.join(SUGGESTION_PROMPT_TYPES)}")
+
+    body = await read_json(request)
+    context = body.get("context", {})
+    if not isinstance(context, dict):
+        return json_error(400, "'context' must be an object")
+
+    try:
+        response = await achat_completion(
+            request.app["pool"],
+            suggestion_messages(context, str(body.get("input", "")), prompt_type),
+            max_tokens=800,
+            temperature=0.7,
+            request_timeout=request.app["upstream_timeout"]
+        )
+    except openai.error.OpenAIError as e:
+        return json_error(502, f"AI suggestion error: {str(e)}")
+
+    return web.json_response({"suggestion": response.choices[0].message.content})
+
+async def analyze_offer(request):
+    body = await read_json(request)
+    offer = body.get("offer", {})
+    if not isinstance(offer, dict):
+        return json_error(400, "'offer' must be an object")
+    app = request.app
+
+    async def evaluate(name):
+        context, details, _ = section_analysis_request(offer, name)
+        response = await achat_completion(
+            app["pool"],
+            suggestion_messages(context, details, "section_analysis"),
+            max_tokens=200,
+            temperature=0.7,
+            request_timeout=app["upstream_timeout"]
+        )
+        return name, response.choices[0].message.content
+
+    # Sections are evaluated concurrently; the synthesis only sees their evaluations
+    tasks = [asyncio.ensure_future(evaluate(name)) for name in ANALYSIS_SECTIONS]
+    try:
+        evaluations = dict(await asyncio.gather(*tasks))
+        response = await achat_completion(
+            app["pool"],
+            suggestion_messages(offer_business(offer), offer_synthesis_input(evaluations), "offer_analysis"),
+            max_tokens=800,
+            temperature=0.7,
+            request_timeout=app["upstream_timeout"]
+        )
+    except openai.error.OpenAIError as e:
+        return json_error(502, f"AI analysis error: {str(e)}")
+    finally:
+        # A failed section makes the other evaluations useless
+        for task in tasks:
+            task.cancel()
+
+    return web.json_response({"analysis": response.choices[0].message.content, "sections": evaluations})
+
+async def score(request):
+    body = await read_json(request)
+    fields = ["dream_outcome", "likelihood", "speed", "ease", "total_value", "offer_price", "risk_reversal"]
+    try:
+        values = {field: float(body[field]) for field in fields if field in body}
+    except (TypeError, ValueError):
+        return json_error(400, f"Score inputs must be numbers: {', '.join(fields)}")
+    if not all(math.isfinite(value) for value in values.values()):
+        return json_error(400, "Score inputs must be finite numbers")
+    return web.json_response(calculate_offer_score(**values))
+
+async def health(request):
+    app = request.app
+    counters = app["counters"]
+    return web.json_response({"in_flight": counters.in_flight, "max_in_flight": app["max_in_flight"],
+                              "cancelled": counters.cancelled, "api_keys": len(app["pool"])})
+
+async def open_http_session(app):
+    # Connector limit bounds upstream concurrency; requests beyond it wait for a free connection
+    app["http"] = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=app["max_in_flight"]))
+    # Scraping gets its own session so user-supplied URLs can only reach public hosts
+    app["scraper"] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=app["max_in_flight"], resolver=PublicResolver(), use_dns_cache=False)
+    )
+
+async def close_http_session(app):
+    await app["http"].close()
+    await app["scraper"].close()
+
+def create_app(api_token, max_in_flight=200, timeout=60, upstream_timeout=45):
+    app = web.Application(middlewares=[require_token, backpressure])
+    app["api_token"] = api_token
+    app["pool"] = ApiKeyPool(load_api_keys(load_secrets()))
+    app["memo"] = WebsiteAnalysisMemo()
+    app["counters"] = RequestCounters()
+    app["max_in_flight"] = max_in_flight
+    app["timeout"] = timeout
+    app["upstream_timeout"] = upstream_timeout
+    app.on_startup.append(open_http_session)
+    app.on_cleanup.append(close_http_session)
+    app.add_routes([
+        web.post("/analyze-website", analyze_website),
+        web.post("/suggest/{prompt_type}", suggest),
+        web.post("/analyze-offer", analyze_offer),
+        web.post("/score", score),
+        web.get("/health", health)
+    ])
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="No-Brainer Offer Builder HTTP API")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Interface to listen on; use 0.0.0.0 to accept remote clients")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-in-flight", type=int, default=200,
+                        help="Concurrent requests served before answering 429")
+    parser.add_argument("--timeout", type=float, default=60, help="Total time allowed per request in seconds")
+    parser.add_argument("--upstream-timeout", type=float, default=45, help="Timeout for each OpenAI call in seconds")
+    args = parser.parse_args()
+
+    api_token = os.environ.get("OFFER_BUILDER_API_TOKEN")
+    if not api_token:
+        parser.error("set OFFER_BUILDER_API_TOKEN to the token clients must send in the X-API-Token header")
+
+    app = create_app(api_token, args.max_in_flight, args.timeout, args.upstream_timeout)
+    if not len(app["pool"]):
+        print("Warning: no OpenAI API key configured; AI endpoints will fail")
+    # Cancel handlers when their client disconnects so abandoned requests stop consuming tokens
+    web.run_app(app, host=args.host, port=args.port, handler_cancellation=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,523 @@
+"""
+Concurrent-session load test for the No-Brainer Offer Builder.
+
+Starts streamlit-app.py with `streamlit run` in a subprocess, pointed at local
+stub servers for the OpenAI API and for the website being analyzed, and drives
+N simulated browser sessions over Streamlit's websocket protocol through the
+full page 0 -> 9 flow. Reports rerun latency percentiles, throughput, and the
+CPU and RSS of the app server process for each concurrency level.
+
+Usage:
+    python load-test.py --concurrency 1,2,4,8 --sessions 3
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.NumberInput_pb2 import NumberInput
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit-app.py")
+
+# Canned website analysis returned by the stub OpenAI server
+STUB_ANALYSIS = {
+    "industry": "Coaching",
+    "product": "Online fitness coaching",
+    "price_range": "$100-$500",
+    "offer_elements": "Monthly coaching plan, free intro call",
+    "value_propositions": "Personalized plans, weekly check-ins",
+    "guarantees": "30-day money-back guarantee",
+    "dream_outcome": "Lose 10kg in 12 weeks without giving up favourite foods",
+    "offer_score": 6,
+    "recommendation": "Add a results-based guarantee."
+}
+
+STUB_SUGGESTION = """
+- **Add a fast-start bonus:** A 15-minute onboarding call that delivers a first win in 24 hours.
+- **Stack a done-for-you asset:** Include templates worth $297 that cost nothing to deliver.
+- **Strengthen the guarantee:** Refund plus keep the materials if no result in 30 days.
+"""
+
+STUB_PAGE = """
+<html>
+<head><title>Acme Coaching</title><style>body {{ color: #333; }}</style></head>
+<body>
+<header>Acme Coaching</header>
+<nav><a href="/">Home</a> <a href="/pricing">Pricing</a></nav>
+<main>
+<h1>Get fit in 12 weeks</h1>
+<p>Personalized coaching plans with weekly check-ins. Only $199/month.</p>
+<p>30-day money-back guarantee. Over 500 happy clients. Updated {stamp}.</p>
+<p>Program code: {code}</p>
+{filler}
+</main>
+<script>console.log("tracking");</script>
+<footer>Copyright Acme</footer>
+</body>
+</html>
+"""
+
+# Words for the per-session client stories, so each session's page has its own content
+STORY_WORDS = """
+lost gained kept weight energy strength sleep habits coach plan meals week month program
+results confidence running lifting stress family routine morning evening protein recipes
+progress goal trainer check-in support community journey healthy simple busy parent office
+""".split()
+
+def sample_latency(mean):
+    """Sample a request latency (seconds) from a log-normal distribution around the mean"""
+    if mean <= 0:
+        return 0
+    return random.lognormvariate(math.log(mean), 0.35)
+
+# Stub servers
+class CallCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def increment(self):
+        with self.lock:
+            self.count += 1
+
+def make_openai_handler(latency, calls):
+    class StubOpenAIHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            calls.increment()
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(sample_latency(latency))
+
+            prompt = body.get("messages", [{}])[-1].get("content", "")
+            if "valid JSON" in prompt:
+                # Name the product after the page's program code, so each session's answers differ
+                code = re.search(r"Program code: (\w+)", prompt)
+                analysis = dict(STUB_ANALYSIS)
+                if code:
+                    analysis["product"] = f"{analysis['product']} {code.group(1)}"
+                content = json.dumps(analysis)
+            else:
+                content = STUB_SUGGESTION
+
+            payload = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(prompt) + len(content)) // 4}
+            }).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("x-ratelimit-limit-requests", "10000")
+            self.send_header("x-ratelimit-remaining-requests", "9999")
+            self.send_header("x-ratelimit-limit-tokens", "300000")
+            self.send_header("x-ratelimit-remaining-tokens", "299000")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubOpenAIHandler
+
+def make_site_handler(latency):
+    class StubSiteHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(sample_latency(latency))
+            # Content depends on the path, so sessions using different paths never share an analysis
+            rng = random.Random(self.path)
+            filler = "\n".join(
+                f"<p>Client story {i}: {' '.join(rng.choice(STORY_WORDS) for _ in range(12))}.</p>" for i in range(40)
+            )
+            code = self.path.rstrip("/").rsplit("/", 1)[-1] or "home"
+            page = STUB_PAGE.format(stamp=time.strftime("%H:%M:%S"), code=code, filler=filler).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubSiteHandler
+
+def start_server(handler):
+    """Start a threaded HTTP server on a free local port and return it"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# App server
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_app(port, openai_base, usage_file):
+    """Start the app with `streamlit run` against the stub servers and return the process"""
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_BASE": openai_base,
+        "OPENAI_API_KEY": "sk-load-test",
+        # Keep load-test clicks out of the real usage stats and skip the startup warm-up
+        "OFFER_BUILDER_USAGE_FILE": usage_file,
+        "OFFER_BUILDER_WARMUP_TOKEN_BUDGET": "0"
+    })
+    env.pop("OPENAI_API_KEYS", None)
+    return subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH,
+         "--server.headless", "true",
+         "--server.address", "127.0.0.1",
+         "--server.port", str(port),
+         "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        cwd=os.path.dirname(APP_PATH), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+async def wait_until_healthy(app, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            if app.poll() is not None:
+                raise RuntimeError(f"streamlit exited with code {app.returncode}")
+            try:
+                async with http.get(f"http://127.0.0.1:{port}/_stcore/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError("streamlit did not become healthy in time")
+
+# Simulated session
+class SessionDriver:
+    """Drives one browser session over the app's websocket and records rerun latencies.
+
+    Each session uses its own site path and product name, so its AI requests and website
+    analysis miss the caches shared between sessions, as they would for real users.
+    """
+
+    def __init__(self, http, ws_url, site_url, timeout):
+        self.http = http
+        self.ws_url = ws_url
+        self.tag = uuid.uuid4().hex[:8]
+        self.site_url = f"{site_url}{self.tag}"
+        self.timeout = timeout
+        self.latencies = []
+        self.widgets = {}  # widget id -> Element of the last completed run
+        self.states = {}   # widget id -> WidgetState the browser would send back
+        self.ws = None
+
+    async def run(self, trigger=None):
+        """Send a rerun with the current widget states and wait for the script to finish"""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = ""
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        if trigger is not None:
+            msg.rerun_script.widget_states.widgets.append(trigger)
+
+        start = time.perf_counter()
+        await self.ws.send_bytes(msg.SerializeToString())
+        await asyncio.wait_for(self.wait_for_run(), self.timeout)
+        self.latencies.append(time.perf_counter() - start)
+
+        # Like the browser, forget the state of widgets that are no longer rendered
+        self.states = {wid: state for wid, state in self.states.items() if wid in self.widgets}
+
+    async def wait_for_run(self):
+        widgets = {}
+        while True:
+            ws_msg = await self.ws.receive()
+            if ws_msg.type != aiohttp.WSMsgType.BINARY:
+                raise RuntimeError(f"Websocket closed ({ws_msg.type.name})")
+            fwd = ForwardMsg()
+            fwd.ParseFromString(ws_msg.data)
+            kind = fwd.WhichOneof("type")
+
+            if kind == "new_session":
+                widgets = {}
+            elif kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    raise RuntimeError(element.exception.message)
+                widget = getattr(element, element_type)
+                if getattr(widget, "id", ""):
+                    widgets[widget.id] = widget
+            elif kind == "script_finished":
+                if fwd.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                if fwd.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("Script failed to compile")
+                self.widgets = widgets
+                return
+
+    def widget(self, key=None, label=None):
+        for wid, widget in self.widgets.items():
+            if (key is not None and wid.endswith(f"-{key}")) or (label is not None and widget.label == label):
+                return wid, widget
+        raise LookupError(f"No widget {key or label!r} in the last run")
+
+    def set_value(self, key, value):
+        wid, widget = self.widget(key=key)
+        state = WidgetState(id=wid)
+        field = type(widget).__name__
+        if field in ("TextInput", "TextArea", "Selectbox"):
+            state.string_value = value
+        elif field == "MultiSelect":
+            state.string_array_value.data.extend(value)
+        elif field == "Slider":
+            state.double_array_value.data.append(value)
+        elif field == "NumberInput" and widget.data_type == NumberInput.INT:
+            state.int_value = value
+        else:
+            state.double_value = value
+        self.states[wid] = state
+
+    async def input(self, key, value):
+        self.set_value(key, value)
+        await self.run()
+
+    async def click(self, label):
+        wid, _ = self.widget(label=label)
+        await self.run(WidgetState(id=wid, trigger_value=True))
+
+    async def run_flow(self):
+        async with self.http.ws_connect(self.ws_url, protocols=("streamlit",), max_msg_size=0) as ws:
+            self.ws = ws
+            await self.run()
+
+            # Page 0: website analysis, then skip ahead
+            wid, _ = self.widget(label="Your business website URL")
+            self.states[wid] = WidgetState(id=wid, string_value=self.site_url)
+            await self.run()
+            await self.click("Analyze Website")
+            await self.click("Skip website analysis")
+            await self.run()
+
+            # Page 1: welcome
+            await self.click("Next")
+
+            # Page 2: business basics
+            await self.input("form_industry", "Coaching")
+            await self.input("form_product", f"Online fitness coaching {self.tag}")
+            await self.input("form_price", "$100-$500")
+            await self.click("Get Offer Ideas")
+            await self.click("Next")
+
+            # Page 3: dream outcome (suggestion is generated on input)
+            await self.input("form_outcome_description", "Lose 10kg in 12 weeks")
+            self.set_value("form_outcome_value", 8)
+            await self.click("Next")
+
+            # Page 4: likelihood
+            await self.input("form_proof_elements", ["Case Studies/Testimonials"])
+            await self.input("form_success_story", "500 clients, average 8kg lost")
+            await self.click("Get Credibility Suggestions")
+            self.set_value("form_credibility", 7)
+            await self.click("Next")
+
+            # Page 5: time to results
+            await self.input("form_time_to_results", "Weeks")
+            await self.input("form_acceleration", "Day-one meal plan")
+            await self.click("Get Acceleration Ideas")
+            self.set_value("form_speed", 6)
+            await self.click("Next")
+
+            # Page 6: effort
+            await self.input("form_effort_required", "Track meals daily")
+            await self.input("form_effort_reduction", "Photo-based tracking")
+            await self.click("Get Effort Reduction Ideas")
+            self.set_value("form_ease", 7)
+            await self.click("Next")
+
+            # Page 7: risk reversal
+            await self.input("form_guarantees", ["Money-back guarantee"])
+            await self.input("form_guarantee_statement", "Lose 5kg in 6 weeks or your money back")
+            await self.click("Get Guarantee Ideas")
+            self.set_value("form_risk_reversal", 8)
+            await self.click("Next")
+
+            # Page 8: value stack
+            await self.input("form_core_offer", "12-week coaching program")
+            await self.click("Generate Bonus Ideas")
+            self.set_value("form_bonus_1", "Recipe book")
+            self.set_value("form_total_value", 2000)
+            self.set_value("form_offer_price", 499)
+            await self.click("Next")
+
+            # Page 9: results and analysis
+            await self.click("Get Complete Offer Analysis")
+
+# Measurement helpers
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+def process_cpu_seconds(pid):
+    """User + system CPU time consumed so far by the process"""
+    with open(f"/proc/{pid}/stat") as f:
+        # Skip past the command name, which may contain spaces
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+def process_rss_mb(pid):
+    """Current resident set size of the process in MB"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def run_level(concurrency, sessions_per_worker, app_pid, ws_url, site_url, timeout, openai_calls):
+    """Run one concurrency level and return the app server's measurements"""
+    latencies = []
+    errors = []
+    peak_rss = process_rss_mb(app_pid)
+    done = asyncio.Event()
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while not done.is_set():
+            peak_rss = max(peak_rss, process_rss_mb(app_pid))
+            await asyncio.sleep(0.25)
+
+    async def worker(http):
+        for _ in range(sessions_per_worker):
+            driver = SessionDriver(http, ws_url, site_url, timeout)
+            try:
+                await driver.run_flow()
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            latencies.extend(driver.latencies)
+
+    sampler = asyncio.create_task(sample_rss())
+    cpu_start = process_cpu_seconds(app_pid)
+    calls_start = openai_calls.count
+    wall_start = time.perf_counter()
+
+    async with aiohttp.ClientSession() as http:
+        await asyncio.gather(*(worker(http) for _ in range(concurrency)))
+
+    wall = time.perf_counter() - wall_start
+    cpu = process_cpu_seconds(app_pid) - cpu_start
+    done.set()
+    await sampler
+
+    return {
+        "concurrency": concurrency,
+        "sessions": concurrency * sessions_per_worker,
+        "reruns": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "wall_s": round(wall, 2),
+        "reruns_per_s": round(len(latencies) / wall, 2) if wall else 0,
+        "sessions_per_min": round(concurrency * sessions_per_worker / wall * 60, 2) if wall else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+        "cpu_pct": round(cpu / wall * 100, 1) if wall else 0,
+        "rss_mb": round(peak_rss, 1),
+        "openai_calls": openai_calls.count - calls_start
+    }
+
+def print_report(results):
+    columns = ["concurrency", "sessions", "reruns", "errors", "reruns_per_s", "sessions_per_min",
+               "p50_ms", "p90_ms", "p99_ms", "max_ms", "cpu_pct", "rss_mb", "openai_calls"]
+    print(" ".join(f"{c:>16}" for c in columns))
+    for row in results:
+        print(" ".join(f"{row[c]:>16}" for c in columns))
+    for row in results:
+        for sample in row["error_samples"]:
+            print(f"[concurrency {row['concurrency']}] error: {sample}")
+
+async def run_levels(levels, args, app, port, site_url, openai_calls):
+    await wait_until_healthy(app, port)
+    ws_url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    results = []
+    for concurrency in levels:
+        print(f"Running {concurrency} concurrent session(s)...")
+        results.append(await run_level(concurrency, args.sessions, app.pid, ws_url, site_url, args.timeout, openai_calls))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the No-Brainer Offer Builder")
+    parser.add_argument("--concurrency", default="1,2,4,8",
+                        help="Comma-separated list of concurrent session counts")
+    parser.add_argument("--sessions", type=int, default=2,
+                        help="Sessions each concurrent worker runs back-to-back")
+    parser.add_argument("--openai-latency", type=float, default=1.5,
+                        help="Mean latency of the stub OpenAI API in seconds")
+    parser.add_argument("--site-latency", type=float, default=0.3,
+                        help="Mean latency of the stub website in seconds")
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="Timeout for a single rerun in seconds")
+    parser.add_argument("--port", type=int, default=0,
+                        help="Port for the app server (default: a free port)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    openai_calls = CallCounter()
+    openai_server = start_server(make_openai_handler(args.openai_latency, openai_calls))
+    site_server = start_server(make_site_handler(args.site_latency))
+    site_url = f"http://127.0.0.1:{site_server.server_port}/"
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    port = args.port or free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        app = start_app(port, f"http://127.0.0.1:{openai_server.server_port}/v1",
+                        os.path.join(tmp, "usage-stats.json"))
+        try:
+            results = asyncio.run(run_levels(levels, args, app, port, site_url, openai_calls))
+        finally:
+            app.terminate()
+            try:
+                app.wait(10)
+            except subprocess.TimeoutExpired:
+                app.kill()
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    openai_server.shutdown()
+    site_server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,696 @@
+"""
+Core offer-building logic shared by the Streamlit app and the HTTP API service.
+
+Nothing in here depends on Streamlit: prompts, website scraping and analysis,
+the offer scoring formula, the OpenAI key pool and the website analysis memo.
+"""
+import asyncio
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import aiohttp
+import openai
+import requests
+from bs4 import BeautifulSoup
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SUGGESTION_SYSTEM_PROMPT = "You are an expert in creating no-brainer offers based on frameworks from Jay Abraham, Alex Hormozi, and MJ DeMarco. Provide specific, actionable advice."
+WEBSITE_SYSTEM_PROMPT = "You are an expert in analyzing business websites and creating no-brainer offers based on frameworks from Jay Abraham, Alex Hormozi, and MJ DeMarco."
+
+# Standalone suggestion prompts; section_analysis and offer_analysis are only used as steps of
+# the offer analysis (see ANALYSIS_SECTIONS)
+SUGGESTION_PROMPT_TYPES = ["value_enhancement", "dream_outcome", "risk_reversal", "bonuses"]
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Prompts
+def build_suggestion_prompt(context, question, prompt_type):
+    """Construct the prompt for the type of suggestion needed"""
+    if prompt_type == "value_enhancement":
+        return f"""
+        As an expert in creating no-brainer offers (based on Alex Hormozi, Jay Abraham, and MJ DeMarco's frameworks),
+        provide specific suggestions to enhance this offer:
+
+        Industry: {context.get('industry', 'Not specified')}
+        Product/Service: {context.get('product', 'Not specified')}
+        Current offer: {question}
+
+        Give 3 specific, actionable suggestions to make this offer more compelling.
+        Focus on: increasing perceived value, reducing risk, decreasing time to results, or minimizing effort required.
+        Format as a bulleted list with brief explanations.
+        """
+
+    elif prompt_type == "dream_outcome":
+        return f"""
+        As an offer specialist, help craft a more compelling dream outcome for this business:
+
+        Industry: {context.get('industry', 'Not specified')}
+        Product/Service: {context.get('product', 'Not specified')}
+        Current outcome description: {question}
+
+        Provide 2-3 suggestions to make this dream outcome more specific, emotionally compelling, and valuable to potential customers.
+        """
+
+    elif prompt_type == "risk_reversal":
+        return f"""
+        As a specialist in creating no-brainer offers, suggest a powerful risk-reversal guarantee for:
+
+        Industry: {context.get('industry', 'Not specified')}
+        Product/Service: {context.get('product', 'Not specified')}
+        Price point: {context.get('price', 'Not specified')}
+        Current guarantee idea: {question}
+
+        Provide 2 specific, innovative guarantee structures that would make this offer truly risk-free for customers.
+        Focus on unique approaches that competitors likely aren't using.
+        """
+
+    elif prompt_type == "bonuses":
+        return f"""
+        As an expert in value stacking and offer creation, suggest high-perceived-value bonuses for:
+
+        Industry: {context.get('industry', 'Not specified')}
+        Product/Service: {context.get('product', 'Not specified')}
+        Current core offer: {context.get('core_offer', 'Not specified')}
+
+        Recommend 3 specific, compelling bonuses that:
+        1. Have high perceived value but low delivery cost
+        2. Complement the core offer
+        3. Address related customer pain points
+
+        For each bonus, suggest a specific name, description, and perceived value amount.
+        """
+
+    elif prompt_type == "section_analysis":
+        return f"""
+        Evaluate only the {context.get('section', 'offer')} element of this offer based on the principles of no-brainer offers:
+
+        Industry: {context.get('industry', 'Not specified')}
+        Product/Service: {context.get('product', 'Not specified')}
+        {question}
+
+        In 2-3 sentences, rate this element (1-10) and name its main strength and its main weakness.
+        """
+
+    elif prompt_type == "offer_analysis":
+        return f"""
+        Analyze this complete offer based on the principles of no-brainer offers, using these evaluations of its elements:
+
+        Industry: {context.get('industry', 'Not specified')}
+        Product/Service: {context.get('product', 'Not specified')}
+
+        {question}
+
+        Provide:
+        1. A specific score (1-10) for this offer with brief explanation
+        2. The strongest element of this offer
+        3. The weakest element of this offer
+        4. One specific, actionable improvement that would have the biggest impact
+        """
+
+    return f"As an expert in creating no-brainer offers, provide suggestions for: {question}"
+
+def suggestion_messages(context, question, prompt_type):
+    return [
+        {"role": "system", "content": SUGGESTION_SYSTEM_PROMPT},
+        {"role": "user", "content": build_suggestion_prompt(context, question, prompt_type)}
+    ]
+
+def offer_ideas_request(industry, product, price, goal):
+    """Context and input of the page-2 "Get Offer Ideas" (value_enhancement) suggestion"""
+    context = {"industry": industry, "product": product, "price": price, "goal": goal}
+    return context, f"Product: {product}, Goal: {goal}"
+
+# Offer analysis: each section is evaluated separately, then a synthesis sees only the evaluations
+ANALYSIS_SECTIONS = {
+    "outcome": ("Dream Outcome", ["outcome_description", "outcome_value"]),
+    "proof": ("Proof & Credibility", ["proof_elements", "success_story", "credibility"]),
+    "speed": ("Time to Results", ["time_to_results", "acceleration", "speed"]),
+    "effort": ("Effort & Sacrifice", ["effort_required", "effort_reduction", "ease"]),
+    "guarantee": ("Risk Reversal", ["guarantees", "guarantee_statement", "risk_reversal"]),
+    "value_stack": ("Value Stack", ["core_offer", "bonus_1", "bonus_2", "bonus_3", "total_value"]),
+    "pricing": ("Pricing", ["price", "offer_price", "total_value"])
+}
+
+def offer_business(offer):
+    """Business context shared by every step of the offer analysis"""
+    return {"industry": offer.get("industry", ""), "product": offer.get("product", "")}
+
+def section_analysis_request(offer, name):
+    """Context and input of one section_analysis prompt, plus the section's own inputs (for cache keys)"""
+    title, fields = ANALYSIS_SECTIONS[name]
+    inputs = {field: offer.get(field, "") for field in fields}
+    details = "\n".join(
+        f"{field.replace('_', ' ').capitalize()}: {', '.join(value) if isinstance(value, list) else value or 'Not specified'}"
+        for field, value in inputs.items()
+    )
+    return {**offer_business(offer), "section": title}, details, inputs
+
+def offer_synthesis_input(evaluations):
+    """Input of the offer_analysis prompt from the section evaluations, keyed by section name"""
+    return "\n\n".join(f"{ANALYSIS_SECTIONS[name][0]}: {evaluation}" for name, evaluation in evaluations.items())
+
+def suggestion_cache_key(messages, max_tokens):
+    """Key identifying an exact suggestion request, safe to share between sessions"""
+    return content_hash([messages, max_tokens])
+
+def website_messages(website_text, domain):
+    prompt = f"""
+    Analyze this website content from {domain} and extract the following information:
+
+    Website text content:
+    \"\"\"{website_text}\"\"\"
+
+    1. What industry is this business in? Choose from: SaaS, Coaching, E-commerce, Services, or Other.
+    2. What is their primary product or service?
+    3. What is their current price point? If not explicit, estimate a range.
+    4. What offer elements are currently present on their website?
+    5. What key value propositions do they mention?
+    6. Do they have any clear guarantees, risk reversals, or social proof?
+    7. What is their dream outcome for customers?
+
+    Then, rate their current offer on a scale of 1-10 based on Hormozi's & Abraham's frameworks.
+
+    Format the response as valid JSON with these keys:
+    "industry": string (one of the categories),
+    "product": string,
+    "price_range": string,
+    "offer_elements": string,
+    "value_propositions": string,
+    "guarantees": string,
+    "dream_outcome": string,
+    "offer_score": number (1-10),
+    "recommendation": string (one key suggestion)
+    """
+    return [
+        {"role": "system", "content": WEBSITE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_website_analysis(analysis_text):
+    """Parse the JSON website analysis out of a model response"""
+    try:
+        # Find JSON in the response (in case there's additional text)
+        json_pattern = r'\{.*\}'
+        json_match = re.search(json_pattern, analysis_text, re.DOTALL)
+
+        if json_match:
+            return json.loads(json_match.group(0))
+        return json.loads(analysis_text)
+    except json.JSONDecodeError:
+        # If we can't parse JSON, return a simple dict with the raw response
+        return {
+            "industry": "Other",
+            "product": "Could not determine",
+            "offer_score": 0,
+            "recommendation": "Analysis failed to parse.",
+            "raw_response": analysis_text
+        }
+
+def analysis_error(e):
+    return {
+        "industry": "Other",
+        "product": "Error during analysis",
+        "offer_score": 0,
+        "recommendation": f"Error: {str(e)}"
+    }
+
+def is_successful_analysis(analysis):
+    return "raw_response" not in analysis and not str(analysis.get("recommendation", "")).startswith("Error:")
+
+# Website scraping
+def extract_website_text(html):
+    """Extract the visible text content of an HTML page"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Remove script and style elements
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.extract()
+
+    # Get text content
+    text = soup.get_text(separator=' ', strip=True)
+
+    # Clean up text
+    text = re.sub(r'\s+', ' ', text)
+    return text[:8000]  # Limit text length to avoid token limits
+
+def scrape_website(url):
+    """Scrape text content from a website"""
+    try:
+        response = requests.get(url, headers=SCRAPE_HEADERS, timeout=10)
+        response.raise_for_status()
+        return extract_website_text(response.text)
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+# Scoring
+def calculate_offer_score(dream_outcome=5, likelihood=5, speed=5, ease=5, total_value=1000, offer_price=500, risk_reversal=5):
+    """Score an offer with Hormozi's value equation, the value-to-price ratio and risk reversal"""
+    dream = dream_outcome
+    time_delay = max(1, 11 - speed)  # Invert so lower is better
+    effort = max(1, 11 - ease)  # Invert so lower is better
+
+    value_score = (dream * likelihood) / (time_delay * effort) * 10  # Scale up for readability
+
+    # Calculate price value ratio
+    try:
+        price_ratio = int(total_value) / max(1, int(offer_price))
+    except (TypeError, ValueError):
+        price_ratio = 2
+
+    risk_score = int(risk_reversal)
+
+    overall_score = (value_score * 0.5) + (price_ratio * 0.3) + (risk_score * 0.2)
+    overall_score = min(100, max(0, overall_score))
+
+    return {
+        "value_score": value_score,
+        "price_ratio": price_ratio,
+        "risk_score": risk_score,
+        "overall_score": overall_score
+    }
+
+def content_hash(data):
+    """Stable short hash of JSON-serializable data, used as a cache key"""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+# OpenAI API key pool: shared keys are routed to the one with the most rate-limit headroom
+# A key rejected as invalid or unauthorized is taken out of rotation for this long
+KEY_FAILURE_COOLDOWN = 3600
+
+class ApiKeyPool:
+    """Shared OpenAI API keys with per-key request/token quota tracking from response headers"""
+
+    def __init__(self, keys):
+        self.lock = threading.Lock()
+        self.keys = {
+            key: {
+                "limit_requests": None,
+                "remaining_requests": None,
+                "reset_requests_at": 0,
+                "limit_tokens": None,
+                "remaining_tokens": None,
+                "reset_tokens_at": 0,
+                "cooldown_until": 0,
+                "in_flight": 0,
+                "last_acquired": 0
+            }
+            for key in dict.fromkeys(keys)
+        }
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def _headroom(state, now):
+        """Fraction of the tighter of the request and token quotas still available, None if unknown"""
+        if now < state["cooldown_until"]:
+            return -1
+        ratios = []
+        for kind in ("requests", "tokens"):
+            limit = state[f"limit_{kind}"]
+            remaining = state[f"remaining_{kind}"]
+            if limit and remaining is not None and now < state[f"reset_{kind}_at"]:
+                ratios.append(max(0, remaining) / limit)
+        return min(ratios, default=None)
+
+    def acquire(self, estimated_tokens):
+        """Pick the key with the most headroom and reserve a request against it"""
+        with self.lock:
+            now = time.time()
+            headroom = {k: self._headroom(state, now) for k, state in self.keys.items()}
+            # A key without quota headers yet ranks level with the measured ones (their
+            # average), not above them, so a key that never succeeds can't take all traffic
+            measured = [h for h in headroom.values() if h is not None and h >= 0]
+            unknown = sum(measured) / len(measured) if measured else 1.0
+            key = max(
+                self.keys,
+                key=lambda k: (unknown if headroom[k] is None else headroom[k], -self.keys[k]["in_flight"],
+                               -self.keys[k]["cooldown_until"], -self.keys[k]["last_acquired"])
+            )
+            state = self.keys[key]
+            state["in_flight"] += 1
+            state["last_acquired"] = time.monotonic()
+            # Reserve quota up front so concurrent requests spread across keys before headers arrive
+            if state["remaining_requests"] is not None:
+                state["remaining_requests"] -= 1
+            if state["remaining_tokens"] is not None:
+                state["remaining_tokens"] -= estimated_tokens
+            return key
+
+    def release(self, key, headers, rate_limited=False, rejected=False):
+        """Update a key's quota from response or error headers; a rejected key is rested for KEY_FAILURE_COOLDOWN"""
+        with self.lock:
+            state = self.keys[key]
+            state["in_flight"] = max(0, state["in_flight"] - 1)
+            now = time.time()
+
+            for kind in ("requests", "tokens"):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if limit is not None and remaining is not None:
+                    state[f"limit_{kind}"] = int(limit)
+                    state[f"remaining_{kind}"] = int(remaining)
+                    state[f"reset_{kind}_at"] = now + parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+
+            if rate_limited:
+                retry_after = headers.get("retry-after")
+                state["cooldown_until"] = now + (float(retry_after) if retry_after else 20)
+            if rejected:
+                state["cooldown_until"] = now + KEY_FAILURE_COOLDOWN
+
+def parse_reset_duration(value):
+    """Parse a rate-limit reset header like '1s', '6m0s' or '120ms' into seconds"""
+    if not value:
+        return 60
+    seconds = 0
+    for amount, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value):
+        seconds += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return seconds
+
+def load_api_keys(secrets):
+    """Collect shared API keys from a secrets mapping and environment variables"""
+    keys = []
+    if "openai" in secrets:
+        keys.extend(secrets["openai"].get("api_keys", []))
+        if secrets["openai"].get("api_key"):
+            keys.append(secrets["openai"]["api_key"])
+    keys.extend(k.strip() for k in os.environ.get("OPENAI_API_KEYS", "").split(",") if k.strip())
+    if os.environ.get("OPENAI_API_KEY"):
+        keys.append(os.environ["OPENAI_API_KEY"])
+    return keys
+
+async def achat_completion(pool, messages, max_tokens, temperature, model="gpt-4", api_key=None, request_timeout=None):
+    """Create a chat completion with the caller's own key, or the pool key with the most headroom.
+
+    Cancelling the coroutine closes the upstream connection.
+    """
+    if not api_key and not len(pool):
+        raise openai.error.AuthenticationError("No OpenAI API key configured")
+    attempts = 1 if api_key else len(pool)
+    params = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+
+    for attempt in range(attempts):
+        key = api_key or pool.acquire(max_tokens)
+        try:
+            response, _, _ = await openai.api_requestor.APIRequestor(key=key).arequest(
+                "post", "/chat/completions", params, request_timeout=request_timeout
+            )
+        except openai.error.RateLimitError as e:
+            if api_key:
+                raise
+            pool.release(key, e.headers, rate_limited=True)
+            # Retry on the next key with headroom
+            if attempt == attempts - 1:
+                raise
+            continue
+        except (openai.error.AuthenticationError, openai.error.PermissionError) as e:
+            if api_key:
+                raise
+            # An invalid or revoked key fails every request: take it out of rotation and try another
+            pool.release(key, {}, rejected=True)
+            logger.warning("OpenAI key ending in %s was rejected (%s); resting it for %ss",
+                           key[-4:], e, KEY_FAILURE_COOLDOWN)
+            if attempt == attempts - 1:
+                raise
+            continue
+        except BaseException:
+            if not api_key:
+                pool.release(key, {})
+            raise
+
+        if not api_key:
+            pool.release(key, response._headers)
+        return openai.util.convert_to_openai_object(response, key)
+
+class AiTaskRunner:
+    """Runs AI requests as tasks on a background event loop so superseded ones can be cancelled mid-flight"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.http = asyncio.run_coroutine_threadsafe(self._open_session(), self.loop).result()
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.slots = {}
+        self.metrics = Counter()
+
+    async def _open_session(self):
+        return aiohttp.ClientSession()
+
+    async def _run(self, make_coro):
+        # One connection pool for all OpenAI calls; cancelling a task closes its connection
+        openai.aiosession.set(self.http)
+        return await make_coro()
+
+    def submit(self, owner, key, make_coro, slot=None):
+        """Run make_coro() as a task owned by owner, or join owner's pending task with the same key.
+
+        A new task in a slot supersedes owner's pending tasks in that slot, which are cancelled.
+        """
+        with self.lock:
+            future = self.tasks.get((owner, key))
+            if future is not None and not future.done():
+                self.metrics["joined"] += 1
+                return future
+            superseded = [f for (o, k), f in self.tasks.items()
+                          if slot is not None and o == owner and self.slots.get((o, k)) == slot]
+            future = asyncio.run_coroutine_threadsafe(self._run(make_coro), self.loop)
+            self.tasks[(owner, key)] = future
+            self.slots[(owner, key)] = slot
+            self.metrics["started"] += 1
+        for f in superseded:
+            f.cancel()
+        future.add_done_callback(lambda f: self._finished(owner, key, f))
+        return future
+
+    def _finished(self, owner, key, future):
+        with self.lock:
+            if self.tasks.get((owner, key)) is future:
+                del self.tasks[(owner, key)]
+                del self.slots[(owner, key)]
+            if future.cancelled():
+                self.metrics["cancelled"] += 1
+            elif future.exception() is not None:
+                self.metrics["failed"] += 1
+            else:
+                self.metrics["completed"] += 1
+
+    def cancel(self, owner, keep=()):
+        """Cancel owner's pending tasks except those whose key is in keep, returning how many were cancelled"""
+        with self.lock:
+            pending = [f for (o, k), f in self.tasks.items() if o == owner and k not in keep]
+        return sum(f.cancel() for f in pending)
+
+# Suggestions shared across sessions and warmed up ahead of time
+class SuggestionCache:
+    """Process-wide LRU cache of AI suggestions keyed by suggestion_cache_key"""
+
+    def __init__(self, max_entries=5000):
+        self.lock = threading.Lock()
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def set(self, key, suggestion):
+        with self.lock:
+            self.entries[key] = suggestion
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+class UsageStats:
+    """How often each industry/price/goal/product combination asked for offer ideas, saved to a JSON file.
+
+    Only the max_entries most frequent combinations are kept, and changes are written
+    every flush_interval seconds rather than on every click. Several app processes can
+    share the file: each flush adds this process's new counts to the file's under a lock.
+    """
+
+    def __init__(self, path, max_entries=1000, flush_interval=30):
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.path = path
+        self.max_entries = max_entries
+        self.counts = self._read()
+        self.pending = Counter()  # Recorded since the last flush
+        self._prune()
+
+        if flush_interval > 0:
+            threading.Thread(target=self._flush_periodically, args=(flush_interval,), daemon=True).start()
+            atexit.register(self.flush)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return Counter({tuple(row["combination"]): row["count"] for row in json.load(f)})
+        except (OSError, ValueError, KeyError, TypeError):
+            return Counter()
+
+    def _prune(self):
+        # Called with the lock held (or before other threads can see the object)
+        if len(self.counts) > self.max_entries:
+            self.counts = Counter(dict(self.counts.most_common(self.max_entries)))
+
+    def record(self, industry, product, price, goal):
+        with self.lock:
+            self.counts[(industry, product, price, goal)] += 1
+            self.pending[(industry, product, price, goal)] += 1
+            # Prune in batches so a click stays O(1) amortized
+            if len(self.counts) >= 2 * self.max_entries:
+                self._prune()
+
+    def flush(self):
+        """Add the counts recorded since the last flush to the file, keeping other processes' counts"""
+        with self.write_lock:
+            with self.lock:
+                if not self.pending:
+                    return
+                pending, self.pending = self.pending, Counter()
+            try:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                # Re-read and write under an exclusive lock so concurrent flushes don't drop each other's counts
+                with open(self.path + ".lock", "a") as lock_file:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    counts = self._read() + pending
+                    if len(counts) > self.max_entries:
+                        counts = Counter(dict(counts.most_common(self.max_entries)))
+                    rows = [{"combination": list(c), "count": n} for c, n in counts.items()]
+                    # Write then rename so a crash never leaves a truncated file
+                    tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "w") as f:
+                        json.dump(rows, f)
+                    os.replace(tmp_path, self.path)
+            except OSError:
+                with self.lock:
+                    self.pending.update(pending)
+                return
+            with self.lock:
+                # Rank by every process's counts, plus clicks recorded during the write
+                self.counts = counts + self.pending
+                self._prune()
+
+    def _flush_periodically(self, interval):
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def most_common(self, n):
+        with self.lock:
+            return [combination for combination, _ in self.counts.most_common(n)]
+
+async def warm_up_offer_ideas(pool, cache, usage, token_budget, top=20, max_tokens=800):
+    """Precompute offer ideas for the most requested combinations, within a token budget.
+
+    Returns the number of suggestions generated and the tokens spent.
+    """
+    generated = spent = 0
+    for industry, product, price, goal in usage.most_common(top):
+        context, question = offer_ideas_request(industry, product, price, goal)
+        messages = suggestion_messages(context, question, "value_enhancement")
+        key = suggestion_cache_key(messages, max_tokens)
+        if key in cache:
+            continue
+
+        # Worst case: the whole prompt (~4 characters per token) plus a full-length answer
+        estimate = sum(len(m["content"]) for m in messages) // 4 + max_tokens
+        if spent + estimate > token_budget:
+            break
+
+        try:
+            response = await achat_completion(pool, messages, max_tokens=max_tokens, temperature=0.7)
+        except openai.error.OpenAIError as e:
+            logger.warning("Offer ideas warm-up stopped: %s", e)
+            break
+
+        cache.set(key, response.choices[0].message.content)
+        spent += response.get("usage", {}).get("total_tokens", estimate)
+        generated += 1
+
+    return generated, spent
+
+# Near-duplicate memoization of website analyses
+# Calibrated on 8000-character scrapes: banner and date swaps stay within 8 bits,
+# unrelated pages are typically 28 bits apart
+SIMHASH_THRESHOLD = int(os.environ.get("OFFER_BUILDER_SIMHASH_THRESHOLD", "8"))
+
+def simhash(text):
+    """64-bit SimHash of word 3-shingles; near-identical texts differ in only a few bits"""
+    words = re.findall(r'\w+', text.lower())
+    shingles = Counter(" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2)))
+
+    weights = [0] * 64
+    for shingle, count in shingles.items():
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += count if h >> bit & 1 else -count
+
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+# Prices and percentages, e.g. "$199", "€1,499.00", "20%" or "99 USD"; dates and times don't match
+PRICE_PATTERN = re.compile(r'[$€£¥]\s?\d[\d,]*(?:\.\d+)?|\d[\d,]*(?:\.\d+)?(?:\s?%|\s?(?:USD|EUR|GBP)\b)')
+
+def page_fingerprint(text):
+    """Fingerprint for reusing analyses: a hash of the page's prices, which must match exactly,
+    and the SimHash of its text, which only has to be close.
+
+    A changed price barely moves the SimHash but changes the analysis (price range, score).
+    """
+    prices = sorted(re.sub(r'\s', '', token) for token in PRICE_PATTERN.findall(text))
+    return content_hash(prices), simhash(text)
+
+class WebsiteAnalysisMemo:
+    """Website analyses keyed by domain and content fingerprint, shared across sessions"""
+
+    def __init__(self, max_entries=1000):
+        self.lock = threading.Lock()
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def lookup(self, domain, fingerprint):
+        """Return the stored analysis with the same prices whose SimHash is closest, if within SIMHASH_THRESHOLD bits"""
+        prices, text_hash = fingerprint
+        with self.lock:
+            matches = [
+                ((text_hash ^ fp[1]).bit_count(), (d, fp))
+                for d, fp in self.entries
+                if d == domain and fp[0] == prices and (text_hash ^ fp[1]).bit_count() <= SIMHASH_THRESHOLD
+            ]
+            if not matches:
+                return None
+            _, key = min(matches)
+            self.entries.move_to_end(key)
+            return dict(self.entries[key])
+
+    def store(self, domain, fingerprint, analysis):
+        with self.lock:
+            self.entries[(domain, fingerprint)] = dict(analysis)
+            self.entries.move_to_end((domain, fingerprint))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
@@ -1,16 +1,128 @@
 import streamlit as st
 import pandas as pd
 import random
-import openai
-import json
 import time
-import requests
-from bs4 import BeautifulSoup
 import re
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import CancelledError, TimeoutError
 from urllib.parse import urlparse
+from offer_engine import (
+    ANALYSIS_SECTIONS, AiTaskRunner, ApiKeyPool, SuggestionCache, UsageStats, WebsiteAnalysisMemo,
+    achat_completion, analysis_error, calculate_offer_score, content_hash, is_successful_analysis,
+    load_api_keys, offer_business, offer_ideas_request, offer_synthesis_input, page_fingerprint,
+    parse_website_analysis, scrape_website, section_analysis_request, suggestion_cache_key,
+    suggestion_messages, warm_up_offer_ideas, website_messages
+)
 
 st.set_page_config(page_title="No-Brainer Offer Builder", layout="wide")
 
+# Opt-in rerun profiling (admins only): OFFER_BUILDER_PROFILE=1 profiles every rerun,
+# ?profile=<token> profiles a single session when OFFER_BUILDER_PROFILE_TOKEN is set
+PROFILE_DIR = os.environ.get("OFFER_BUILDER_PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.environ.get("OFFER_BUILDER_PROFILE_KEEP", "50"))
+PROFILE_INTERVAL = float(os.environ.get("OFFER_BUILDER_PROFILE_INTERVAL", "0.005"))
+
+class RerunProfiler:
+    """Sampling profiler for one script rerun, written as collapsed stacks (speedscope/flamegraph.pl)"""
+
+    def __init__(self, page, trigger):
+        self.page = page
+        self.trigger = trigger
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.started = time.time()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        # Stop on our own if the rerun never reaches the footer and is not flushed
+        while not self._stop.wait(PROFILE_INTERVAL) and time.time() - self.started < 300:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename == __file__:
+                    # Line numbers tell apart the top-level blocks of this script
+                    stack.append(f"{code.co_name} (streamlit-app.py:{frame.f_lineno})")
+                    if code.co_name == "<module>":
+                        break
+                else:
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self, interrupted=False):
+        """Stop sampling and write the profile, keeping only the newest PROFILE_KEEP files"""
+        self._stop.set()
+        self._thread.join()
+
+        trigger = re.sub(r'[^A-Za-z0-9_-]+', '_', self.trigger)[:60]
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        name = f"{stamp}-{int(self.started * 1000) % 1000:03d}-page{self.page}-{trigger}"
+        if interrupted:
+            name += "-interrupted"
+
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(os.path.join(PROFILE_DIR, name + ".collapsed"), "w") as f:
+                for stack, count in self.stacks.items():
+                    f.write(f"{stack} {count}\n")
+
+            profiles = sorted(
+                (os.path.join(PROFILE_DIR, n) for n in os.listdir(PROFILE_DIR) if n.endswith(".collapsed")),
+                key=os.path.getmtime
+            )
+            for old in profiles[:-PROFILE_KEEP]:
+                os.remove(old)
+        except OSError:
+            pass
+
+def profiling_enabled():
+    """Check whether this rerun should be profiled"""
+    if os.environ.get("OFFER_BUILDER_PROFILE") == "1":
+        return True
+    token = os.environ.get("OFFER_BUILDER_PROFILE_TOKEN")
+    return bool(token) and st.query_params.get("profile") == token
+
+def form_snapshot():
+    return {k: repr(v) for k, v in st.session_state.items() if k.startswith('form_')}
+
+def rerun_changes():
+    """Compare with the previous rerun: whether the page changed (None on the first run), which form fields were edited and which buttons were clicked"""
+    # Taken at the end of the previous rerun, after its widgets rendered, so a field's first edit is seen too
+    previous = st.session_state.get('_form_snapshot')
+    snapshot = form_snapshot()
+    st.session_state._form_snapshot = snapshot
+    previous_page = st.session_state.get('_last_page')
+    st.session_state._last_page = st.session_state.get('page', 0)
+
+    if previous is None:
+        return None, [], []
+    edited = [k for k in snapshot if snapshot[k] != previous.get(k)]
+    # Buttons are keyed 'btn_*' and read True only in the rerun their click triggered
+    clicked = [k for k, v in st.session_state.items() if k.startswith('btn_') and v is True]
+    return previous_page != st.session_state._last_page, edited, clicked
+
+# Flush a profile left behind by a rerun that was interrupted before the footer
+if st.session_state.get('_profiler') is not None:
+    st.session_state._profiler.stop(interrupted=True)
+    st.session_state._profiler = None
+
+# The trigger bookkeeping only runs for profiled reruns
+if profiling_enabled():
+    navigated, edited, clicked = rerun_changes()
+    trigger = "initial" if navigated is None else "+".join(clicked + edited) or ("navigation" if navigated else "rerun")
+    st.session_state._profiler = RerunProfiler(st.session_state.get('page', 0), trigger)
+
 # Initialize session state
 if 'page' not in st.session_state:
     st.session_state.page = 0
@@ -20,132 +132,96 @@ if 'offer_score' not in st.session_state:
     st.session_state.offer_score = 0
 if 'ai_suggestions' not in st.session_state:
     st.session_state.ai_suggestions = {}
+if '_session_id' not in st.session_state:
+    st.session_state._session_id = uuid.uuid4().hex
     
-# Securely handle the OpenAI API key using Streamlit secrets
-try:
-    # Check if we're running in Streamlit Cloud where secrets are available
-    from streamlit import secrets
-    if "openai" in secrets:
-        openai.api_key = secrets["openai"]["api_key"]
-        st.session_state.openai_available = True
-    else:
-        # Fallback to environment variable or sidebar input
-        import os
-        api_key = os.environ.get("OPENAI_API_KEY")
-        
-        if not api_key:
-            api_key = st.sidebar.text_input("Enter OpenAI API Key (or set in .streamlit/secrets.toml)", type="password")
-        
-        if api_key:
-            openai.api_key = api_key
-            st.session_state.openai_available = True
-        else:
-            st.sidebar.warning("API key required for AI assistance")
-            st.session_state.openai_available = False
-except ImportError:
-    # Local development fallback
-    api_key = st.sidebar.text_input("Enter OpenAI API Key", type="password")
-    if api_key:
-        openai.api_key = api_key
+# OpenAI API key pool, shared by all sessions of this process
+@st.cache_resource
+def get_key_pool():
+    try:
+        secrets = st.secrets if "openai" in st.secrets else {}
+    except FileNotFoundError:
+        secrets = {}
+    return ApiKeyPool(load_api_keys(secrets))
+
+# Background event loop running this process's AI requests as cancellable tasks
+@st.cache_resource
+def get_task_runner():
+    return AiTaskRunner()
+
+# AI requests this rerun asks for. A request replacing one from the same call site cancels
+# it right away; at the end of the rerun, pending requests nothing asked for again are cancelled
+st.session_state._requested_keys = set()
+
+# Shared keys from secrets or the environment go into the pool; a key entered in the
+# sidebar is kept in this session only so it never leaks to other users
+if len(get_key_pool()):
+    st.session_state.user_api_key = None
+    st.session_state.openai_available = True
+else:
+    st.session_state.user_api_key = st.sidebar.text_input("Enter OpenAI API Key (or set in .streamlit/secrets.toml)", type="password")
+    if st.session_state.user_api_key:
         st.session_state.openai_available = True
     else:
-        st.sidebar.warning("Enter API key to enable AI assistance")
+        st.sidebar.warning("API key required for AI assistance")
         st.session_state.openai_available = False
 
+# Offer ideas warm-up: precompute suggestions for the most popular page-2 combinations
+WARMUP_TOKEN_BUDGET = int(os.environ.get("OFFER_BUILDER_WARMUP_TOKEN_BUDGET", "20000"))
+WARMUP_TOP = int(os.environ.get("OFFER_BUILDER_WARMUP_TOP", "20"))
+WARMUP_INTERVAL = float(os.environ.get("OFFER_BUILDER_WARMUP_INTERVAL", "0"))
+USAGE_FILE = os.environ.get("OFFER_BUILDER_USAGE_FILE", "usage-stats.json")
+
+@st.cache_resource
+def get_shared_suggestions():
+    return SuggestionCache()
+
+@st.cache_resource
+def get_usage_stats():
+    return UsageStats(USAGE_FILE)
+
+@st.cache_resource
+def start_offer_ideas_warmup():
+    """Warm up once at startup, then every WARMUP_INTERVAL seconds if set (runs once per process)"""
+    if WARMUP_TOKEN_BUDGET <= 0 or not len(get_key_pool()):
+        return None
+    
+    pool, cache, usage, runner = get_key_pool(), get_shared_suggestions(), get_usage_stats(), get_task_runner()
+    
+    def warm_up():
+        while True:
+            try:
+                runner.submit(
+                    "warmup", "offer_ideas",
+                    lambda: warm_up_offer_ideas(pool, cache, usage, WARMUP_TOKEN_BUDGET, WARMUP_TOP)
+                ).result()
+            except Exception:
+                pass
+            if WARMUP_INTERVAL <= 0:
+                break
+            time.sleep(WARMUP_INTERVAL)
+    
+    thread = threading.Thread(target=warm_up, daemon=True)
+    thread.start()
+    return thread
+
+start_offer_ideas_warmup()
+
+if profiling_enabled():
+    with st.sidebar.expander("AI request metrics"):
+        st.json(dict(get_task_runner().metrics))
+
 # AI assistance function
-def get_ai_suggestion(context, question, prompt_type):
+async def get_ai_suggestion(pool, api_key, context, question, prompt_type, max_tokens=800):
     """Get AI suggestions based on user input"""
-    if not st.session_state.openai_available:
-        return "AI assistance unavailable. Please enter your OpenAI API key."
-    
     try:
-        # Construct prompt based on type of suggestion needed
-        if prompt_type == "value_enhancement":
-            prompt = f"""
-            As an expert in creating no-brainer offers (based on Alex Hormozi, Jay Abraham, and MJ DeMarco's frameworks), 
-            provide specific suggestions to enhance this offer:
-            
-            Industry: {context.get('industry', 'Not specified')}
-            Product/Service: {context.get('product', 'Not specified')}
-            Current offer: {question}
-            
-            Give 3 specific, actionable suggestions to make this offer more compelling.
-            Focus on: increasing perceived value, reducing risk, decreasing time to results, or minimizing effort required.
-            Format as a bulleted list with brief explanations.
-            """
-        
-        elif prompt_type == "dream_outcome":
-            prompt = f"""
-            As an offer specialist, help craft a more compelling dream outcome for this business:
-            
-            Industry: {context.get('industry', 'Not specified')}
-            Product/Service: {context.get('product', 'Not specified')}
-            Current outcome description: {question}
-            
-            Provide 2-3 suggestions to make this dream outcome more specific, emotionally compelling, and valuable to potential customers.
-            """
-            
-        elif prompt_type == "risk_reversal":
-            prompt = f"""
-            As a specialist in creating no-brainer offers, suggest a powerful risk-reversal guarantee for:
-            
-            Industry: {context.get('industry', 'Not specified')}
-            Product/Service: {context.get('product', 'Not specified')}
-            Price point: {context.get('price', 'Not specified')}
-            Current guarantee idea: {question}
-            
-            Provide 2 specific, innovative guarantee structures that would make this offer truly risk-free for customers.
-            Focus on unique approaches that competitors likely aren't using.
-            """
-            
-        elif prompt_type == "bonuses":
-            prompt = f"""
-            As an expert in value stacking and offer creation, suggest high-perceived-value bonuses for:
-            
-            Industry: {context.get('industry', 'Not specified')}
-            Product/Service: {context.get('product', 'Not specified')}
-            Current core offer: {context.get('core_offer', 'Not specified')}
-            
-            Recommend 3 specific, compelling bonuses that:
-            1. Have high perceived value but low delivery cost
-            2. Complement the core offer
-            3. Address related customer pain points
-            
-            For each bonus, suggest a specific name, description, and perceived value amount.
-            """
-            
-        elif prompt_type == "offer_analysis":
-            prompt = f"""
-            Analyze this complete offer based on the principles of no-brainer offers:
-            
-            Industry: {context.get('industry', 'Not specified')}
-            Product/Service: {context.get('product', 'Not specified')}
-            Dream outcome: {context.get('outcome_description', 'Not specified')}
-            Core offer: {context.get('core_offer', 'Not specified')}
-            Bonuses: {context.get('bonus_1', '')}, {context.get('bonus_2', '')}, {context.get('bonus_3', '')}
-            Guarantee: {context.get('guarantee_statement', 'Not specified')}
-            Price: ${context.get('offer_price', 'Not specified')}
-            Stated value: ${context.get('total_value', 'Not specified')}
-            
-            Provide:
-            1. A specific score (1-10) for this offer with brief explanation
-            2. The strongest element of this offer
-            3. The weakest element of this offer
-            4. One specific, actionable improvement that would have the biggest impact
-            """
-        
-        else:
-            prompt = f"As an expert in creating no-brainer offers, provide suggestions for: {question}"
-        
         # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-4",  # Use appropriate model
-            messages=[
-                {"role": "system", "content": "You are an expert in creating no-brainer offers based on frameworks from Jay Abraham, Alex Hormozi, and MJ DeMarco. Provide specific, actionable advice."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=800,
-            temperature=0.7
+        response = await achat_completion(
+            pool,
+            suggestion_messages(context, question, prompt_type),
+            max_tokens=max_tokens,
+            temperature=0.7,
+            api_key=api_key
         )
         
         return response.choices[0].message.content
@@ -153,6 +229,46 @@ def get_ai_suggestion(context, question, prompt_type):
     except Exception as e:
         return f"AI suggestion error: {str(e)}"
 
+def run_ai_tasks(tasks):
+    """Run several AI requests concurrently as tasks owned by this session and wait for all of them.
+    
+    tasks maps each task key to its slot (the call site it answers; a new request in a slot
+    supersedes the pending one) and a function returning its coroutine. Returns the results
+    by key, with None for tasks that were cancelled.
+    """
+    runner = get_task_runner()
+    st.session_state._requested_keys.update(tasks)
+    futures = {
+        key: runner.submit(st.session_state._session_id, key, make_coro, slot)
+        for key, (slot, make_coro) in tasks.items()
+    }
+    results = {}
+    status = st.empty()
+    started = time.time()
+    
+    for key, future in futures.items():
+        while True:
+            try:
+                results[key] = future.result(timeout=0.25)
+                break
+            except TimeoutError:
+                # Each update is a point where Streamlit can stop this rerun for a newer one,
+                # leaving the tasks running until they are cancelled or finish
+                status.caption(f"Waiting for AI response ({time.time() - started:.0f}s)...")
+            except CancelledError:
+                results[key] = None
+                break
+    
+    status.empty()
+    return results
+
+def run_ai_task(key, make_coro, slot=None):
+    """Run an AI request as a task owned by this session and wait for its result.
+    
+    Returns None if the task was cancelled.
+    """
+    return run_ai_tasks({key: (slot, make_coro)})[key]
+
 # Navigation functions
 def next_page():
     # Save form inputs to session state
@@ -161,22 +277,93 @@ def next_page():
             response_key = key[5:]  # Remove 'form_' prefix
             st.session_state.responses[response_key] = st.session_state[key]
     
+    get_task_runner().cancel(st.session_state._session_id)
     st.session_state.page += 1
 
 def prev_page():
+    get_task_runner().cancel(st.session_state._session_id)
     st.session_state.page -= 1
 
+def suggestion_failed(suggestion):
+    """Whether a suggestion request was cancelled or returned an error instead of a suggestion"""
+    return suggestion is None or suggestion.startswith("AI suggestion error:")
+
 # Initialize AI suggestion cache
-def get_cached_suggestion(context, input_text, prompt_type):
+def suggestion_task(context, input_text, prompt_type, cache_key, max_tokens=800):
+    """Return a function starting the request for a suggestion, or None if it is already cached"""
+    suggestions = st.session_state.ai_suggestions
+    pool = get_key_pool()
+    api_key = st.session_state.user_api_key
+    
+    # Identical requests from other sessions or the warm-up job are shared
+    shared = get_shared_suggestions()
+    shared_key = suggestion_cache_key(suggestion_messages(context, input_text, prompt_type), max_tokens)
+    if cache_key not in suggestions and shared_key in shared:
+        suggestions[cache_key] = shared.get(shared_key)
+    if cache_key in suggestions:
+        return None
+    
+    # The task fills the cache itself, so a result that arrives after this rerun was
+    # interrupted (without being superseded) is still there next time. Errors are not
+    # cached so the next attempt retries the request.
+    async def generate():
+        suggestion = await get_ai_suggestion(pool, api_key, context, input_text, prompt_type, max_tokens)
+        if not suggestion_failed(suggestion):
+            suggestions[cache_key] = suggestion
+            shared.set(shared_key, suggestion)
+        return suggestion
+    
+    return generate
+
+def get_cached_suggestion(context, input_text, prompt_type, cache_key=None, max_tokens=800):
     """Get AI suggestion from cache or generate new one"""
-    cache_key = f"{prompt_type}_{input_text}"
+    if not st.session_state.openai_available:
+        return "AI assistance unavailable. Please enter your OpenAI API key."
+    
+    if cache_key is None:
+        cache_key = f"{prompt_type}_{input_text}"
     
-    if cache_key not in st.session_state.ai_suggestions:
-        with st.spinner("Generating AI suggestions..."):
-            suggestion = get_ai_suggestion(context, input_text, prompt_type)
-            st.session_state.ai_suggestions[cache_key] = suggestion
+    generate = suggestion_task(context, input_text, prompt_type, cache_key, max_tokens)
+    if generate is None:
+        return st.session_state.ai_suggestions[cache_key]
     
-    return st.session_state.ai_suggestions[cache_key]
+    with st.spinner("Generating AI suggestions..."):
+        suggestion = run_ai_task(cache_key, generate, slot=prompt_type)
+    return suggestion if suggestion is not None else "AI request was cancelled."
+
+def get_offer_analysis(context):
+    """Evaluate each offer section, re-running only sections whose inputs changed, then synthesize"""
+    if not st.session_state.openai_available:
+        return "AI assistance unavailable. Please enter your OpenAI API key."
+    
+    business = offer_business(context)
+    
+    # Each section is cached by a hash of its own inputs
+    requests = {}
+    for name in ANALYSIS_SECTIONS:
+        section_context, details, inputs = section_analysis_request(context, name)
+        cache_key = f"section_{name}_{content_hash([business, inputs])}"
+        requests[cache_key] = (name, suggestion_task(section_context, details, "section_analysis", cache_key, max_tokens=200))
+    
+    # Sections whose inputs changed are evaluated concurrently
+    results = run_ai_tasks({
+        key: (f"section_{name}", generate) for key, (name, generate) in requests.items() if generate is not None
+    })
+    evaluations = {}
+    for key, (name, generate) in requests.items():
+        evaluation = st.session_state.ai_suggestions[key] if generate is None else results[key]
+        if suggestion_failed(evaluation):
+            return evaluation or "AI request was cancelled."
+        evaluations[name] = evaluation
+    
+    # The synthesis only sees the section evaluations, so it is cheap and re-runs only when one changes
+    summary = offer_synthesis_input(evaluations)
+    return get_cached_suggestion(
+        business,
+        summary,
+        "offer_analysis",
+        cache_key=f"offer_analysis_{content_hash([business, summary])}"
+    )
 
 # Title and description
 st.title("No-Brainer Offer Builder")
@@ -214,33 +401,6 @@ value_factors = {
     "effort": 0
 }
 
-# Website scraping function
-def scrape_website(url):
-    """Scrape text content from a website"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.extract()
-            
-        # Get text content
-        text = soup.get_text(separator=' ', strip=True)
-        
-        # Clean up text
-        text = re.sub(r'\s+', ' ', text)
-        text = text[:8000]  # Limit text length to avoid token limits
-        
-        return text
-    except Exception as e:
-        return f"Error: {str(e)}"
-
 # Function to analyze website content
 def analyze_website_content(website_text, url):
     """Analyze website content to extract business information and evaluate offer"""
@@ -253,77 +413,53 @@ def analyze_website_content(website_text, url):
             "recommendation": "API key required for analysis."
         }
     
-    try:
-        domain = urlparse(url).netloc
-        prompt = f"""
-        Analyze this website content from {domain} and extract the following information:
-        
-        Website text content:
-        \"\"\"{website_text}\"\"\"
-        
-        1. What industry is this business in? Choose from: SaaS, Coaching, E-commerce, Services, or Other.
-        2. What is their primary product or service?
-        3. What is their current price point? If not explicit, estimate a range.
-        4. What offer elements are currently present on their website?
-        5. What key value propositions do they mention?
-        6. Do they have any clear guarantees, risk reversals, or social proof?
-        7. What is their dream outcome for customers?
-        
-        Then, rate their current offer on a scale of 1-10 based on Hormozi's & Abraham's frameworks.
-        
-        Format the response as valid JSON with these keys:
-        "industry": string (one of the categories),
-        "product": string,
-        "price_range": string,
-        "offer_elements": string,
-        "value_propositions": string,
-        "guarantees": string, 
-        "dream_outcome": string,
-        "offer_score": number (1-10),
-        "recommendation": string (one key suggestion)
-        """
-        
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert in analyzing business websites and creating no-brainer offers based on frameworks from Jay Abraham, Alex Hormozi, and MJ DeMarco."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.5
-        )
-        
-        analysis_text = response.choices[0].message.content
-        
-        # Try to parse the JSON response
+    pool = get_key_pool()
+    api_key = st.session_state.user_api_key
+    
+    async def analyze():
         try:
-            # Find JSON in the response (in case there's additional text)
-            json_pattern = r'\{.*\}'
-            json_match = re.search(json_pattern, analysis_text, re.DOTALL)
+            response = await achat_completion(
+                pool,
+                website_messages(website_text, urlparse(url).netloc),
+                max_tokens=1000,
+                temperature=0.5,
+                api_key=api_key
+            )
             
-            if json_match:
-                analysis_json = json.loads(json_match.group(0))
-            else:
-                analysis_json = json.loads(analysis_text)
+            return parse_website_analysis(response.choices[0].message.content)
                 
-            return analysis_json
-        except json.JSONDecodeError:
-            # If we can't parse JSON, return a simple dict with the raw response
-            return {
-                "industry": "Other",
-                "product": "Could not determine",
-                "offer_score": 0,
-                "recommendation": "Analysis failed to parse.",
-                "raw_response": analysis_text
-            }
-            
-    except Exception as e:
-        return {
-            "industry": "Other",
-            "product": "Error during analysis",
-            "offer_score": 0,
-            "recommendation": f"Error: {str(e)}"
-        }
+        except Exception as e:
+            return analysis_error(e)
+    
+    analysis = run_ai_task(f"website_{content_hash([url, website_text])}", analyze, slot="website")
+    return analysis if analysis is not None else analysis_error("Analysis was cancelled.")
+
+# Near-duplicate memoization of website analyses
+@st.cache_resource
+def get_analysis_memo():
+    return WebsiteAnalysisMemo()
+
+def get_website_analysis(website_text, url, refresh=False):
+    """Reuse the analysis of near-identical content from the same site, or run a new one.
+    
+    Returns the analysis and whether it was reused.
+    """
+    domain = urlparse(url).netloc
+    fingerprint = page_fingerprint(website_text)
+    memo = get_analysis_memo()
+    
+    if not refresh:
+        analysis = memo.lookup(domain, fingerprint)
+        if analysis is not None:
+            return analysis, True
+    
+    analysis = analyze_website_content(website_text, url)
+    
+    # Only keep successful analyses
+    if st.session_state.openai_available and is_successful_analysis(analysis):
+        memo.store(domain, fingerprint, analysis)
+    
+    return analysis, False
 
 # Page content
 if st.session_state.page == 0:
@@ -339,8 +475,9 @@ if st.session_state.page == 0:
     """)
     
     url = st.text_input("Your business website URL", placeholder="https://www.yourbusiness.com")
+    refresh = st.checkbox("Force a fresh analysis (ignore results for unchanged content)")
     
-    if st.button("Analyze Website"):
+    if st.button("Analyze Website", key="btn_analyze_website"):
         if url:
             with st.spinner("Analyzing your website..."):
                 # Initialize session state for website data if it doesn't exist
@@ -358,8 +495,10 @@ if st.session_state.page == 0:
                     st.error(f"Could not scrape website: {website_text}")
                 else:
                     # Analyze content
-                    analysis = analyze_website_content(website_text, url)
+                    analysis, reused = get_website_analysis(website_text, url, refresh)
                     st.session_state.website_data = analysis
+                    if reused:
+                        st.caption("This site's content hasn't meaningfully changed since it was last analyzed, so the previous analysis was reused.")
                     
                     # Display results
                     col1, col2 = st.columns([2, 1])
@@ -407,14 +546,14 @@ if st.session_state.page == 0:
                     
                     # Show continue button
                     st.success("Website analyzed! Now let's build your no-brainer offer.")
-                    if st.button("Continue to Offer Builder"):
+                    if st.button("Continue to Offer Builder", key="btn_continue"):
                         next_page()
         else:
             st.warning("Please enter a website URL")
     
     # Option to skip
     st.markdown("---")
-    if st.button("Skip website analysis"):
+    if st.button("Skip website analysis", key="btn_skip_analysis"):
         next_page()
         
 elif st.session_state.page == 1:
@@ -436,9 +575,9 @@ elif st.session_state.page == 1:
     
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.button("Previous", on_click=prev_page)
+        st.button("Previous", key="btn_previous", on_click=prev_page)
     with col2:
-        st.button("Next", on_click=next_page)
+        st.button("Next", key="btn_next", on_click=next_page)
 
 elif st.session_state.page == 2:
     # Basic business info
@@ -458,24 +597,23 @@ elif st.session_state.page == 2:
     if st.session_state.openai_available and st.session_state.get("form_product") and st.session_state.get("form_industry"):
         # Get AI suggestions
         with st.expander("🤖 AI Suggestions", expanded=True):
-            current_context = {
-                "industry": st.session_state.get("form_industry", ""),
-                "product": st.session_state.get("form_product", ""),
-                "price": st.session_state.get("form_price", ""),
-                "goal": st.session_state.get("form_goal", "")
-            }
+            combination = (
+                st.session_state.get("form_industry", ""),
+                st.session_state.get("form_product", ""),
+                st.session_state.get("form_price", ""),
+                st.session_state.get("form_goal", "")
+            )
             
-            if st.button("Get Offer Ideas"):
-                suggestion = get_cached_suggestion(
-                    current_context,
-                    f"Product: {st.session_state.get('form_product', '')}, Goal: {st.session_state.get('form_goal', '')}",
-                    "value_enhancement"
-                )
+            if st.button("Get Offer Ideas", key="btn_offer_ideas"):
+                # Popular combinations are precomputed by the warm-up job
+                get_usage_stats().record(*combination)
+                current_context, offer_input = offer_ideas_request(*combination)
+                suggestion = get_cached_suggestion(current_context, offer_input, "value_enhancement")
                 st.markdown(suggestion)
     
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.button("Next", on_click=next_page)
+        st.button("Next", key="btn_next", on_click=next_page)
 
 elif st.session_state.page == 3:
     # Dream outcome
@@ -510,9 +648,9 @@ elif st.session_state.page == 3:
     
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.button("Previous", on_click=prev_page)
+        st.button("Previous", key="btn_previous", on_click=prev_page)
     with col2:
-        st.button("Next", on_click=next_page)
+        st.button("Next", key="btn_next", on_click=next_page)
 
 elif st.session_state.page == 4:
     # Perceived likelihood
@@ -539,7 +677,7 @@ elif st.session_state.page == 4:
             proof_elements = st.session_state.get("form_proof_elements", [])
             success_story = st.session_state.get("form_success_story", "")
             
-            if st.button("Get Credibility Suggestions"):
+            if st.button("Get Credibility Suggestions", key="btn_credibility_ideas"):
                 suggestion = get_cached_suggestion(
                     current_context,
                     f"Proof elements: {', '.join(proof_elements)}, Success story: {success_story}",
@@ -554,9 +692,9 @@ elif st.session_state.page == 4:
     
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.button("Previous", on_click=prev_page)
+        st.button("Previous", key="btn_previous", on_click=prev_page)
     with col2:
-        st.button("Next", on_click=next_page)
+        st.button("Next", key="btn_next", on_click=next_page)
 
 elif st.session_state.page == 5:
     # Time delay
@@ -573,7 +711,7 @@ elif st.session_state.page == 5:
     # AI assistance
     if st.session_state.openai_available:
         with st.expander("🤖 AI Acceleration Suggestions", expanded=True):
-            if st.button("Get Acceleration Ideas"):
+            if st.button("Get Acceleration Ideas", key="btn_acceleration_ideas"):
                 suggestion = get_cached_suggestion(
                     current_context,
                     f"Current time to results: {st.session_state.get('form_time_to_results', '')}, Acceleration ideas: {st.session_state.get('form_acceleration', '')}",
@@ -588,9 +726,9 @@ elif st.session_state.page == 5:
     
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.button("Previous", on_click=prev_page)
+        st.button("Previous", key="btn_previous", on_click=prev_page)
     with col2:
-        st.button("Next", on_click=next_page)
+        st.button("Next", key="btn_next", on_click=next_page)
 
 elif st.session_state.page == 6:
     # Effort & sacrifice
@@ -606,7 +744,7 @@ elif st.session_state.page == 6:
     # AI assistance
     if st.session_state.openai_available and st.session_state.get("form_effort_required"):
         with st.expander("🤖 AI Effort Reduction Suggestions", expanded=True):
-            if st.button("Get Effort Reduction Ideas"):
+            if st.button("Get Effort Reduction Ideas", key="btn_effort_ideas"):
                 suggestion = get_cached_suggestion(
                     current_context,
                     f"Current effort required: {st.session_state.get('form_effort_required', '')}, Reduction ideas: {st.session_state.get('form_effort_reduction', '')}",
@@ -621,9 +759,9 @@ elif st.session_state.page == 6:
     
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.button("Previous", on_click=prev_page)
+        st.button("Previous", key="btn_previous", on_click=prev_page)
     with col2:
-        st.button("Next", on_click=next_page)
+        st.button("Next", key="btn_next", on_click=next_page)
 
 elif st.session_state.page == 7:
     # Risk reversal
@@ -650,7 +788,7 @@ elif st.session_state.page == 7:
             guarantees = st.session_state.get("form_guarantees", [])
             guarantee_statement = st.session_state.get("form_guarantee_statement", "")
             
-            if st.button("Get Guarantee Ideas"):
+            if st.button("Get Guarantee Ideas", key="btn_guarantee_ideas"):
                 suggestion = get_cached_suggestion(
                     current_context,
                     guarantee_statement,
@@ -663,9 +801,9 @@ elif st.session_state.page == 7:
     
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.button("Previous", on_click=prev_page)
+        st.button("Previous", key="btn_previous", on_click=prev_page)
     with col2:
-        st.button("Next", on_click=next_page)
+        st.button("Next", key="btn_next", on_click=next_page)
 
 elif st.session_state.page == 8:
     # Value stack
@@ -682,7 +820,7 @@ elif st.session_state.page == 8:
             # Update context with core offer
             current_context["core_offer"] = st.session_state.get("form_core_offer", "")
             
-            if st.button("Generate Bonus Ideas"):
+            if st.button("Generate Bonus Ideas", key="btn_bonus_ideas"):
                 suggestion = get_cached_suggestion(
                     current_context,
                     current_context.get("core_offer", ""),
@@ -703,40 +841,35 @@ elif st.session_state.page == 8:
     
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.button("Previous", on_click=prev_page)
+        st.button("Previous", key="btn_previous", on_click=prev_page)
     with col2:
-        st.button("Next", on_click=next_page)
+        st.button("Next", key="btn_next", on_click=next_page)
 
 elif st.session_state.page == 9:
     # Results page
     st.markdown("## Your No-Brainer Offer")
     
-    # Gather all form data into context
-    current_context = {k[5:]: v for k, v in st.session_state.items() if k.startswith('form_')}
-    st.session_state.responses = current_context
+    # Gather all form data into context: answers saved by next_page, plus any form
+    # values still live (widgets not rendered on this page lose their state)
+    current_context = {
+        **st.session_state.responses,
+        **{k[5:]: v for k, v in st.session_state.items() if k.startswith('form_')}
+    }
     
     # Calculate value score based on Hormozi's value equation
-    dream = value_factors.get("dream_outcome", 5)
-    likelihood = value_factors.get("likelihood", 5)
-    time_delay = max(1, 11 - value_factors.get("time_delay", 5))  # Invert so lower is better
-    effort = max(1, 11 - value_factors.get("effort", 5))  # Invert so lower is better
-    
-    value_score = (dream * likelihood) / (time_delay * effort) * 10  # Scale up for readability
-    
-    # Calculate price value ratio
-    try:
-        total_value = int(st.session_state.responses.get("total_value", 1000))
-        offer_price = int(st.session_state.responses.get("offer_price", 500))
-        price_ratio = total_value / max(1, offer_price)
-    except:
-        price_ratio = 2
-    
-    # Get risk reversal score
-    risk_score = int(st.session_state.responses.get("risk_reversal", 5))
-    
-    # Calculate overall score
-    overall_score = (value_score * 0.5) + (price_ratio * 0.3) + (risk_score * 0.2)
-    overall_score = min(100, max(0, overall_score))
+    scores = calculate_offer_score(
+        dream_outcome=value_factors.get("dream_outcome", 5),
+        likelihood=value_factors.get("likelihood", 5),
+        speed=value_factors.get("time_delay", 5),
+        ease=value_factors.get("effort", 5),
+        total_value=st.session_state.responses.get("total_value", 1000),
+        offer_price=st.session_state.responses.get("offer_price", 500),
+        risk_reversal=st.session_state.responses.get("risk_reversal", 5)
+    )
+    value_score = scores["value_score"]
+    price_ratio = scores["price_ratio"]
+    risk_score = scores["risk_score"]
+    overall_score = scores["overall_score"]
     st.session_state.offer_score = overall_score
     
     # Display summary
@@ -788,13 +921,9 @@ elif st.session_state.page == 9:
     # AI Analysis
     if st.session_state.openai_available:
         with st.expander("🤖 AI Offer Analysis", expanded=True):
-            if st.button("Get Complete Offer Analysis"):
+            if st.button("Get Complete Offer Analysis", key="btn_offer_analysis"):
                 with st.spinner("Analyzing your offer..."):
-                    suggestion = get_cached_suggestion(
-                        current_context,
-                        "Complete offer analysis",
-                        "offer_analysis"
-                    )
+                    suggestion = get_offer_analysis(current_context)
                     st.markdown(suggestion)
     
     # Improvement suggestions
@@ -820,11 +949,11 @@ elif st.session_state.page == 9:
     
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.button("Previous", on_click=prev_page)
+        st.button("Previous", key="btn_previous", on_click=prev_page)
     with col2:
-        if st.button("Start Over"):
+        if st.button("Start Over", key="btn_start_over"):
             for key in list(st.session_state.keys()):
-                if key not in ['openai_available', 'ai_suggestions']:
+                if key not in ['openai_available', 'ai_suggestions', '_profiler', '_session_id']:
                     del st.session_state[key]
             st.session_state.page = 0
             st.session_state.responses = {}
@@ -833,9 +962,16 @@ elif st.session_state.page == 9:
     
     # Export options
     st.markdown("### Export Your Offer")
-    if st.button("Download Offer as PDF"):
+    if st.button("Download Offer as PDF", key="btn_download_pdf"):
         st.info("In a production app, this would generate a PDF with your complete offer details and analysis.")
 
 # Footer
 st.markdown("---")
 st.markdown("No-Brainer Offer Builder - Based on frameworks by Jay Abraham, Alex Hormozi, and MJ DeMarco")
+
+get_task_runner().cancel(st.session_state._session_id, keep=st.session_state._requested_keys)
+
+if st.session_state.get('_profiler') is not None:
+    st.session_state._form_snapshot = form_snapshot()
+    st.session_state._profiler.stop()
+    st.session_state._profiler = None
@@ -0,0 +1,108 @@
+"""Routing of OpenAI requests across the shared key pool"""
+import asyncio
+import time
+
+import openai
+import pytest
+from openai.openai_response import OpenAIResponse
+
+from offer_engine import KEY_FAILURE_COOLDOWN, ApiKeyPool, achat_completion
+
+QUOTA_HEADERS = {
+    "x-ratelimit-limit-requests": "100",
+    "x-ratelimit-remaining-requests": "90",
+    "x-ratelimit-limit-tokens": "10000",
+    "x-ratelimit-remaining-tokens": "9000"
+}
+
+MESSAGES = [{"role": "user", "content": "Suggest a bonus"}]
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Stub OpenAI endpoint: keys in `rejected` get 401, keys in `limited` get 429, others succeed"""
+    calls = []
+    behaviour = {"rejected": set(), "limited": set()}
+
+    async def arequest(self, method, url, params=None, request_timeout=None, **kwargs):
+        calls.append(self.api_key)
+        if self.api_key in behaviour["rejected"]:
+            raise openai.error.AuthenticationError("Incorrect API key provided", http_status=401)
+        if self.api_key in behaviour["limited"]:
+            raise openai.error.RateLimitError("Rate limit reached", http_status=429, headers={"retry-after": "30"})
+        data = {"choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}}]}
+        return OpenAIResponse(data, QUOTA_HEADERS), False, self.api_key
+
+    monkeypatch.setattr(openai.api_requestor.APIRequestor, "arequest", arequest)
+    behaviour["calls"] = calls
+    return behaviour
+
+def complete(pool, api_key=None):
+    return asyncio.run(achat_completion(pool, MESSAGES, max_tokens=100, temperature=0.7, api_key=api_key))
+
+def test_unmeasured_key_does_not_outrank_measured_keys():
+    pool = ApiKeyPool(["good", "new"])
+    assert pool.acquire(100) == "good"
+    pool.release("good", QUOTA_HEADERS)
+
+    # "new" has no quota headers yet: it ranks level with "good", so traffic alternates
+    picked = []
+    for _ in range(4):
+        key = pool.acquire(100)
+        picked.append(key)
+        pool.release(key, QUOTA_HEADERS if key == "good" else {})
+    assert picked.count("good") == 2 and picked.count("new") == 2
+
+def test_failed_request_without_headers_does_not_win_all_traffic():
+    pool = ApiKeyPool(["good", "flaky"])
+    for key in ("good", "flaky"):
+        assert pool.acquire(100) == key
+        pool.release(key, QUOTA_HEADERS if key == "good" else {})
+
+    assert pool.acquire(100) == "good"
+
+def test_rejected_key_is_taken_out_of_rotation(upstream):
+    upstream["rejected"].add("bad")
+    pool = ApiKeyPool(["good", "bad"])
+
+    for _ in range(6):
+        assert complete(pool).choices[0].message.content == "ok"
+
+    assert upstream["calls"].count("bad") == 1
+    assert pool.keys["bad"]["cooldown_until"] > time.time() + KEY_FAILURE_COOLDOWN - 60
+
+def test_rejected_key_is_retried_on_another_key(upstream):
+    upstream["rejected"].add("bad")
+    pool = ApiKeyPool(["bad", "good"])
+
+    assert complete(pool).choices[0].message.content == "ok"
+    assert upstream["calls"] == ["bad", "good"]
+
+def test_all_keys_rejected_raises(upstream):
+    upstream["rejected"].update({"bad", "worse"})
+    pool = ApiKeyPool(["bad", "worse"])
+
+    with pytest.raises(openai.error.AuthenticationError):
+        complete(pool)
+    assert sorted(upstream["calls"]) == ["bad", "worse"]
+    assert all(state["in_flight"] == 0 for state in pool.keys.values())
+
+def test_rate_limited_key_is_rested_and_retried(upstream):
+    upstream["limited"].add("busy")
+    pool = ApiKeyPool(["busy", "good"])
+
+    assert complete(pool).choices[0].message.content == "ok"
+    assert upstream["calls"] == ["busy", "good"]
+    assert complete(pool) and upstream["calls"][-1] == "good"
+
+def test_callers_own_key_is_not_pooled(upstream):
+    upstream["rejected"].add("user-key")
+    pool = ApiKeyPool(["good"])
+
+    with pytest.raises(openai.error.AuthenticationError):
+        complete(pool, api_key="user-key")
+    assert upstream["calls"] == ["user-key"]
+    assert pool.keys["good"]["cooldown_until"] == 0
+
+def test_empty_pool_raises_authentication_error():
+    with pytest.raises(openai.error.AuthenticationError):
+        complete(ApiKeyPool([]))
@@ -0,0 +1,58 @@
+"""Usage-stats file shared by several app processes"""
+import json
+import threading
+
+from offer_engine import UsageStats
+
+COMBINATION = ("Fitness", "Coaching", "$100-$500", "Lose weight")
+
+def file_counts(path):
+    with open(path) as f:
+        return {tuple(row["combination"]): row["count"] for row in json.load(f)}
+
+def test_flush_keeps_other_processes_counts(tmp_path):
+    path = str(tmp_path / "usage-stats.json")
+    first, second = UsageStats(path, flush_interval=0), UsageStats(path, flush_interval=0)
+    first.record(*COMBINATION)
+    second.record(*COMBINATION)
+    second.record("SaaS", "CRM", "$500+", "Save time")
+    first.flush()
+    second.flush()
+
+    assert file_counts(path) == {COMBINATION: 2, ("SaaS", "CRM", "$500+", "Save time"): 1}
+    # The ranking picks up counts flushed by other processes
+    first.flush()
+    assert first.most_common(2)[0] == COMBINATION
+    second.record(*COMBINATION)
+    second.flush()
+    first.record("SaaS", "CRM", "$500+", "Save time")
+    first.flush()
+    assert first.counts == file_counts(path) == {COMBINATION: 3, ("SaaS", "CRM", "$500+", "Save time"): 2}
+
+def test_concurrent_flushes_lose_no_counts(tmp_path):
+    path = str(tmp_path / "usage-stats.json")
+    stats = [UsageStats(path, flush_interval=0) for _ in range(4)]
+
+    def click(usage):
+        for _ in range(50):
+            usage.record(*COMBINATION)
+            usage.flush()
+
+    threads = [threading.Thread(target=click, args=(usage,)) for usage in stats]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert file_counts(path) == {COMBINATION: 200}
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_flush_keeps_most_frequent_combinations(tmp_path):
+    path = str(tmp_path / "usage-stats.json")
+    usage = UsageStats(path, max_entries=2, flush_interval=0)
+    for i, clicks in enumerate([3, 1, 2]):
+        for _ in range(clicks):
+            usage.record("Industry", f"Product {i}", "$0-$100", "Goal")
+    usage.flush()
+
+    assert set(file_counts(path)) == {("Industry", "Product 0", "$0-$100", "Goal"), ("Industry", "Product 2", "$0-$100", "Goal")}
@@ -0,0 +1,33 @@
+"""Reuse of website analyses for near-identical page content"""
+from offer_engine import WebsiteAnalysisMemo, page_fingerprint
+
+STORIES = " ".join(
+    f"Client story {i}: {name} followed the plan for {i + 3} weeks, cooked the {dish} recipes and kept the habits going."
+    for i, (name, dish) in enumerate(
+        [("Ana", "chicken"), ("Ben", "lentil"), ("Cleo", "salmon"), ("Dev", "tofu"), ("Eli", "bean"),
+         ("Fay", "rice"), ("Gus", "pasta"), ("Hana", "curry"), ("Ivo", "soup"), ("Jo", "salad")] * 4
+    )
+)
+
+def page(banner="Spring sale this week only", price="$199/month"):
+    return f"{banner}. Acme Coaching. Get fit in 12 weeks with weekly check-ins, only {price}. 30-day money-back guarantee. {STORIES}"
+
+ANALYSIS = {"industry": "Coaching", "price_range": "$100-$500", "offer_score": 6}
+
+def test_cosmetic_change_reuses_analysis():
+    memo = WebsiteAnalysisMemo()
+    memo.store("acme.com", page_fingerprint(page()), ANALYSIS)
+
+    assert memo.lookup("acme.com", page_fingerprint(page(banner="New recipes every Monday"))) == ANALYSIS
+
+def test_price_change_needs_new_analysis():
+    memo = WebsiteAnalysisMemo()
+    memo.store("acme.com", page_fingerprint(page()), ANALYSIS)
+
+    assert memo.lookup("acme.com", page_fingerprint(page(price="$249/month"))) is None
+
+def test_other_domain_is_not_reused():
+    memo = WebsiteAnalysisMemo()
+    memo.store("acme.com", page_fingerprint(page()), ANALYSIS)
+
+    assert memo.lookup("other.com", page_fingerprint(page())) is None